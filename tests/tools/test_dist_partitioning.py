@@ -0,0 +1,173 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import torch
+import torch.distributed as dist
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'tools', 'distpartitioning'))
+
+from dgl.data.utils import load_tensors
+from utils import write_node_features, argsort_small_ints, reorder_data, read_int_txt_file
+from gloo_wrapper import allgather_sizes
+from multi_dev_init import FEAT_SHUFFLE_DTYPES, get_buffer_layout, get_buffer_piece
+
+
+class TestFeatShuffleDtypes(unittest.TestCase):
+    """FEAT_SHUFFLE_DTYPES"""
+
+    def test_save_load_round_trip(self):
+        # node features stored at a shuffle dtype are loaded back with the same dtype and values
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for name, dtype in FEAT_SHUFFLE_DTYPES.items():
+                feat_file = os.path.join(tmpdir, name + '.dgl')
+                node_features = {'n1/feat': torch.tensor([[0.5, -2.0], [1.25, 3.0]]).to(dtype)}
+                write_node_features(node_features, feat_file)
+                loaded = load_tensors(feat_file)
+                self.assertEqual(loaded['n1/feat'].dtype, dtype)
+                self.assertTrue(torch.equal(loaded['n1/feat'], node_features['n1/feat']))
+
+
+class TestBufferLayout(unittest.TestCase):
+    """get_buffer_layout() and get_buffer_piece()"""
+
+    def test_layout(self):
+        # pieces are padded to 8 bytes and laid out rank after rank
+        counts = np.array([[3, 0], [1, 2]])
+        # fp16 feature of width 2, 1-d float32 feature, int32 nids
+        row_bytes = np.array([4, 4, 4])
+        piece_rows, offsets, rank_bytes = get_buffer_layout(counts, row_bytes)
+        np.testing.assert_array_equal(piece_rows, [[3, 0, 3], [1, 2, 3]])
+        np.testing.assert_array_equal(offsets, [[0, 16, 16], [32, 40, 48]])
+        np.testing.assert_array_equal(rank_bytes, [32, 32])
+        self.assertTrue(np.all(offsets % 8 == 0))
+
+    def test_pieces_round_trip(self):
+        # data written through the views of the pieces is read back unchanged
+        counts = np.array([[3, 0], [1, 2]])
+        pieces = [((2,), torch.float16), ((), torch.float32), ((), torch.int32)]
+        row_bytes = np.array([int(np.prod(dims)) * torch.empty((), dtype=dtype).element_size() \
+                                for dims, dtype in pieces])
+        piece_rows, offsets, rank_bytes = get_buffer_layout(counts, row_bytes)
+        buf = torch.zeros(int(rank_bytes.sum()), dtype=torch.uint8)
+
+        expected = {}
+        for rank in range(counts.shape[0]):
+            for idx, (dims, dtype) in enumerate(pieces):
+                num_rows = int(piece_rows[rank, idx])
+                data = torch.arange(num_rows * int(np.prod(dims))).reshape((num_rows,) + dims).to(dtype) + rank
+                get_buffer_piece(buf, offsets[rank, idx], num_rows, dims, dtype).copy_(data)
+                expected[(rank, idx)] = data
+
+        for (rank, idx), data in expected.items():
+            dims, dtype = pieces[idx]
+            piece = get_buffer_piece(buf, offsets[rank, idx], piece_rows[rank, idx], dims, dtype)
+            self.assertEqual(piece.dtype, dtype)
+            self.assertEqual(tuple(piece.shape), tuple(data.shape))
+            self.assertTrue(torch.equal(piece, data))
+
+    def test_empty_piece(self):
+        # an empty piece keeps its trailing shape and dtype
+        buf = torch.zeros(8, dtype=torch.uint8)
+        piece = get_buffer_piece(buf, 8, 0, (3,), torch.float16)
+        self.assertEqual(tuple(piece.shape), (0, 3))
+        self.assertEqual(piece.dtype, torch.float16)
+
+    def test_1d_piece(self):
+        # a piece with no trailing dims is viewed as a 1-d tensor
+        buf = torch.zeros(16, dtype=torch.uint8)
+        piece = get_buffer_piece(buf, 0, 3, (), torch.float32)
+        self.assertEqual(tuple(piece.shape), (3,))
+
+
+class TestArgsortSmallInts(unittest.TestCase):
+    """argsort_small_ints()"""
+
+    def test_stable(self):
+        # equal keys keep their relative order
+        arr = np.array([2, 0, 1, 0, 2, 1], dtype=np.int64)
+        np.testing.assert_array_equal(argsort_small_ints(arr), [1, 3, 2, 5, 0, 4])
+
+    def test_out_of_uint16_range(self):
+        # negative and large keys are sorted without the uint16 cast
+        arr = np.array([70000, -1, 5, 70000, -1], dtype=np.int64)
+        np.testing.assert_array_equal(argsort_small_ints(arr), [1, 4, 2, 0, 3])
+
+    def test_empty(self):
+        self.assertEqual(len(argsort_small_ints(np.array([], dtype=np.int64))), 0)
+
+
+class TestReorderData(unittest.TestCase):
+    """reorder_data()"""
+
+    def test_reorder(self):
+        # all the columns, including 2-d ones, are reordered by the key column
+        data = {'key': np.array([1, 0, 1, 0]), 'a': np.array([10, 11, 12, 13]), \
+                'b': np.array([[0, 1], [2, 3], [4, 5], [6, 7]])}
+        reorder_data(data, 'key')
+        np.testing.assert_array_equal(data['key'], [0, 0, 1, 1])
+        np.testing.assert_array_equal(data['a'], [11, 13, 10, 12])
+        np.testing.assert_array_equal(data['b'], [[2, 3], [6, 7], [0, 1], [4, 5]])
+
+    def test_view_not_overwritten(self):
+        # a column which is a view into another array is not reused as scratch
+        shared = np.array([0, 1, 0, 1, 0, 1, 9, 9])
+        data = {'ntype': np.array([1, 0, 1, 0, 1, 0]), 'owner': shared[0:6], \
+                'type_nid': np.arange(6)}
+        reorder_data(data, 'ntype')
+        np.testing.assert_array_equal(shared, [0, 1, 0, 1, 0, 1, 9, 9])
+        np.testing.assert_array_equal(data['owner'], [1, 1, 1, 0, 0, 0])
+        np.testing.assert_array_equal(data['type_nid'], [1, 3, 5, 0, 2, 4])
+
+
+class TestReadIntTxtFile(unittest.TestCase):
+    """read_int_txt_file()"""
+
+    def _read(self, content):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            file_name = os.path.join(tmpdir, 'data.txt')
+            with open(file_name, 'w') as f:
+                f.write(content)
+            return read_int_txt_file(file_name)
+
+    def test_read(self):
+        data = self._read('1 2 3\n4 5 6\n')
+        self.assertEqual(data.dtype, np.int64)
+        np.testing.assert_array_equal(data, [[1, 2, 3], [4, 5, 6]])
+
+    def test_malformed_token(self):
+        # the values before the bad token form whole rows, the file must still be rejected
+        with self.assertRaises(ValueError):
+            self._read('1 2\n3 4\nx 6\n')
+
+    def test_ragged(self):
+        with self.assertRaises(ValueError):
+            self._read('1 2\n3\n')
+
+
+class TestAllgatherSizes(unittest.TestCase):
+    """allgather_sizes()"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.init_pg = not dist.is_initialized()
+        if cls.init_pg:
+            dist.init_process_group('gloo', store=dist.HashStore(), rank=0, world_size=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.init_pg:
+            dist.destroy_process_group()
+
+    def test_single_length(self):
+        np.testing.assert_array_equal(allgather_sizes([5], 1), [0, 5])
+
+    def test_multiple_lengths(self):
+        # a prefix sum is computed for each length
+        np.testing.assert_array_equal(allgather_sizes(np.array([5, 0, 3]), 1), [[0, 0, 0], [5, 0, 3]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -18,3 +18,6 @@ SHUFFLE_GLOBAL_DST_ID = "shuffle_global_dst_id"
 OWNER_PROCESS = "owner_proc_id"
 
 PART_LOCAL_NID = "part_local_nid"
+
+#lower bound, in seconds, of the timeout of the process group collectives
+MIN_PROCESS_GROUP_TIMEOUT = 1800
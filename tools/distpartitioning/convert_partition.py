@@ -9,6 +9,7 @@ import pyarrow
 import pandas as pd
 import constants
 from pyarrow import csv
+from utils import argsort_small_ints
 
 def create_dgl_object(graph_name, num_parts, \
                         schema, part_id, node_data, \
@@ -86,11 +87,15 @@ def create_dgl_object(graph_name, num_parts, \
 
 
     # Determine the node ID ranges of different node types.
+    # node_data is sorted by node type, so the nodes of each type are a contiguous block of rows
+    # and the boundaries of all the blocks are found with a single searchsorted. shuffle_global_nids
+    # are contiguous, so the shuffle_global_nid of a row is its offset from the first one.
+    assert np.all(np.diff(ntype_ids) >= 0)
+    ntype_bounds = np.searchsorted(ntype_ids, np.arange(len(ntypes) + 1))
     for ntype_name in global_nid_ranges:
         ntype_id = ntypes_map[ntype_name]
-        type_nids = shuffle_global_nids[ntype_ids == ntype_id]
         node_map_val[ntype_name].append(
-            [int(type_nids[0]), int(type_nids[-1]) + 1])
+            [int(shuffle_global_nids[0] + ntype_bounds[ntype_id]), int(shuffle_global_nids[0] + ntype_bounds[ntype_id + 1])])
 
     #process edges
     shuffle_global_src_id, shuffle_global_dst_id, global_src_id, global_dst_id, global_edge_id, etype_ids = \
@@ -100,20 +105,24 @@ def create_dgl_object(graph_name, num_parts, \
     print('There are {} edges in partition {}'.format(len(shuffle_global_src_id), part_id))
 
     # It's not guaranteed that the edges are sorted based on edge type.
-    # Let's sort edges and all attributes on the edges.
-    sort_idx = np.argsort(etype_ids)
-    shuffle_global_src_id, shuffle_global_dst_id, global_src_id, global_dst_id, global_edge_id, etype_ids = \
-            shuffle_global_src_id[sort_idx], shuffle_global_dst_id[sort_idx], global_src_id[sort_idx], \
-            global_dst_id[sort_idx], global_edge_id[sort_idx], etype_ids[sort_idx]
+    # Let's sort edges and all attributes on the edges, unless they are already sorted.
+    # The sort is stable so that edges of the same type keep their order.
+    if np.any(etype_ids[1:] < etype_ids[:-1]):
+        sort_idx = argsort_small_ints(etype_ids)
+        shuffle_global_src_id, shuffle_global_dst_id, global_src_id, global_dst_id, global_edge_id, etype_ids = \
+                shuffle_global_src_id[sort_idx], shuffle_global_dst_id[sort_idx], global_src_id[sort_idx], \
+                global_dst_id[sort_idx], global_edge_id[sort_idx], etype_ids[sort_idx]
     assert np.all(np.diff(etype_ids) >= 0)
 
     # Determine the edge ID range of different edge types.
-    edge_id_start = edgeid_offset 
+    # The edge counts of all the edge types are computed in one pass, and their prefix sum
+    # gives the offset of each edge type.
+    etype_offsets = np.zeros(len(etypes) + 1, dtype=np.int64)
+    etype_offsets[1:] = np.cumsum(np.bincount(etype_ids, minlength=len(etypes)))
     for etype_name in global_eid_ranges:
         etype_id = etypes_map[etype_name]
-        edge_map_val[etype_name].append([edge_id_start,
-                                         edge_id_start + np.sum(etype_ids == etype_id)])
-        edge_id_start += np.sum(etype_ids == etype_id)
+        edge_map_val[etype_name].append([int(edgeid_offset + etype_offsets[etype_id]),
+                                         int(edgeid_offset + etype_offsets[etype_id + 1])])
 
     # Here we want to compute the unique IDs in the edge list.
     # It is possible that a node that belongs to the partition but it doesn't appear
@@ -1,8 +1,13 @@
+import os
 import argparse
+import tempfile
 import numpy as np
+import torch
 import torch.multiprocessing as mp
-from initialize import proc_exec, single_dev_init, multi_dev_init
+import initialize
+from initialize import proc_exec, multi_dev_init
 from multi_dev_init import splitdata_exec
+from utils import read_partitions_file
 
 def log_params(params): 
     """ Print all the command line arguments for debugging purposes.
@@ -30,6 +35,8 @@ def log_params(params):
     print('Metis partitions: ', params.partitions_file)
     print('Exec Type: ', params.exec_type)
     print('Multiple File Support: ', params.mul_files_dataset)
+    print('Feature Shuffle Dtype: ', params.feat_shuffle_dtype)
+    print('Process Group Timeout: ', params.process_group_timeout)
 
 def single_dev_init(params): 
     """ Main function for distributed implementation on a single machine
@@ -42,21 +49,42 @@ def single_dev_init(params):
     """
     log_params(params)
     processes = []
-    mp.set_start_method("spawn")
+    #with "spawn" every process re-imports torch, dgl and pandas. The forkserver imports 
+    #the pipeline's modules once and forks each process from that already-initialized 
+    #interpreter, without the threads of this process which make a plain "fork" unsafe
+    mp.set_start_method("forkserver", force=True)
+    mp.set_forkserver_preload(["torch", "dgl", "pandas", "initialize", "multi_dev_init"])
+
+    #metis partitions are needed in full by all the processes, read them once here
+    #and share them through shared memory instead of reading the file in every process
+    params.node_part_ids = torch.from_numpy(np.ascontiguousarray(read_partitions_file( \
+                    params.input_dir+'/'+params.partitions_file))).share_memory_()
+
+    #all the processes are on this machine, so they rendezvous through a FileStore
+    #instead of a TCPStore on a fixed port, which can collide with other jobs
+    store_fd, store_file = tempfile.mkstemp(prefix='dgl_dist_store_')
+    os.close(store_fd)
+    init_method = 'file://' + store_file
 
     #Invoke `target` function from each of the spawned process for distributed 
     #implementation
     for rank in range(params.world_size):
         if(params.mul_files_dataset): 
-            p = mp.Process(target=single_dev_init, args=(rank, params.world_size, splitdata_exec, params))
+            p = mp.Process(target=initialize.single_dev_init, args=(rank, params.world_size, splitdata_exec, params), \
+                            kwargs={'init_method': init_method})
         else:
-            p = mp.Process(target=single_dev_init, args=(rank, params.world_size, proc_exec, params))
+            p = mp.Process(target=initialize.single_dev_init, args=(rank, params.world_size, proc_exec, params), \
+                            kwargs={'init_method': init_method})
         p.start()
         processes.append(p)
 
     for p in processes:
         p.join()
 
+    #FileStore removes the file once all the processes are done with it, unless they failed
+    if os.path.exists(store_file):
+        os.remove(store_file)
+
 if __name__ == "__main__":
     """ 
     Start of execution from this point. 
@@ -102,10 +130,18 @@ if __name__ == "__main__":
                     default=None, type=str )
     parser.add_argument('--partitions-file', help='filename of the output of dgl_part2 (metis partitions)',
                     default=None, type=str)
+    parser.add_argument('--feat-shuffle-dtype', help='shuffle and store float32 node features at reduced precision, '
+                    'for models which use them in mixed precision', default=None, type=str, choices=['fp16'])
+    parser.add_argument('--process-group-timeout', help='timeout in seconds of the collectives used to shuffle the data, '
+                    'the DGL_PG_TIMEOUT environment variable overrides it, values below 1800 are raised to 1800', default=1800, type=int)
     params = parser.parse_args()
 
+    #features are cast to the shuffle dtype only when they are exchanged by splitdata_exec
+    if (params.feat_shuffle_dtype is not None) and (not params.mul_files_dataset):
+        parser.error('--feat-shuffle-dtype is only supported with --mul-files-dataset')
+
     #invoke the starting function here.
     if(params.exec_type == 0):
-        singe_dev_init(params)
+        single_dev_init(params)
     else:
         multi_dev_init(params)
@@ -1,7 +1,11 @@
 import os
 import numpy as np
+import torch
 import constants
 
+from utils import read_int_txt_file
+from concurrent.futures import ThreadPoolExecutor
+
 def get_dataset(input_dir, graph_name, rank):
     """
     Function to read the multiple file formatted dataset. 
@@ -36,49 +40,55 @@ def get_dataset(input_dir, graph_name, rank):
 
     #iterate over the sub-dirs and extract the nodetypes
     #in each nodetype folder read all the features assigned to 
-    #current rank
-    siblings = os.listdir(input_dir)
-    for s in siblings:
-        if s.startswith("nodes-"):
-            tokens = s.split("-")
-            ntype = tokens[1]
-            num_feats = tokens[2]
-            for idx in range(int(num_feats)):
-                feat_file = s +'/node-feat-'+'{:02d}'.format(idx) +'/'+ str(rank)+'.npy'
-                if (os.path.exists(input_dir+'/'+feat_file)):
-                    features = np.load(input_dir+'/'+feat_file)
-                    node_features[ntype+'/feat'] = torch.tensor(features)
+    #current rank. np.load releases the GIL while reading, so the feature
+    #files are read by background threads while the txt files are parsed below
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        feat_futures = []
+        siblings = os.listdir(input_dir)
+        for s in siblings:
+            if s.startswith("nodes-"):
+                tokens = s.split("-")
+                ntype = tokens[1]
+                num_feats = tokens[2]
+                for idx in range(int(num_feats)):
+                    feat_file = s +'/node-feat-'+'{:02d}'.format(idx) +'/'+ str(rank)+'.npy'
+                    if (os.path.exists(input_dir+'/'+feat_file)):
+                        feat_futures.append((ntype+'/feat', executor.submit(np.load, input_dir+'/'+feat_file)))
 
-    #done build node_features locally. 
-    for k, v in node_features.items():
-        print('[Rank: ', rank, '] node feature name: ', k, ', feature data shape: ', v.size())
+        #read (split) xxx_nodes.txt file
+        node_file = input_dir+'/'+graph_name+'_nodes'+'{:02d}.txt'.format(rank)
+        node_data = read_int_txt_file(node_file)
+        nodes_datadict = {}
+        nodes_datadict[constants.NTYPE_ID] = node_data[:,0]
+        nodes_datadict[constants.GLOBAL_TYPE_NID] = node_data[:,5]
+        print('[Rank: ', rank, '] Done reading node_data: ', len(nodes_datadict), nodes_datadict[constants.NTYPE_ID].shape)
 
-    #read (split) xxx_nodes.txt file
-    node_file = input_dir+'/'+graph_name+'_nodes'+'{:02d}.txt'.format(rank)
-    node_data = np.loadtxt(node_file, delimiter=' ', dtype='int64')
-    nodes_datadict = {}
-    nodes_datadict[constants.NTYPE_ID] = node_data[:,0]
-    nodes_datadict[constants.GLOBAL_TYPE_NID] = node_data[:,5]
-    print('[Rank: ', rank, '] Done reading node_data: ', len(nodes_datadict), nodes_datadict[constants.NTYPE_ID].shape)
+        #read (split) xxx_edges.txt file
+        edge_datadict = {}
+        edge_file = input_dir+'/'+graph_name+'_edges'+'{:02d}.txt'.format(rank)
+        edge_data = read_int_txt_file(edge_file)
+        edge_datadict[constants.GLOBAL_SRC_ID] = edge_data[:,0]
+        edge_datadict[constants.GLOBAL_DST_ID] = edge_data[:,1]
+        edge_datadict[constants.GLOBAL_TYPE_EID] = edge_data[:,2]
+        edge_datadict[constants.ETYPE_ID] = edge_data[:,3]
+        print('[Rank: ', rank, '] Done reading edge_file: ', len(edge_datadict), edge_datadict[constants.GLOBAL_SRC_ID].shape)
 
-    #read (split) xxx_edges.txt file
-    edge_datadict = {}
-    edge_file = input_dir+'/'+graph_name+'_edges'+'{:02d}.txt'.format(rank)
-    edge_data = np.loadtxt(edge_file, delimiter=' ', dtype='int64')
-    edge_datadict[constants.GLOBAL_SRC_ID] = edge_data[:,0]
-    edge_datadict[constants.GLOBAL_DST_ID] = edge_data[:,1]
-    edge_datadict[constants.GLOBAL_TYPE_EID] = edge_data[:,2]
-    edge_datadict[constants.ETYPE_ID] = edge_data[:,3]
-    print('[Rank: ', rank, '] Done reading edge_file: ', len(edge_datadict), edge_datadict[constants.GLOBAL_SRC_ID].shape)
+        #read (single) file xxx_removed_edges.txt file
+        redge_datadict = {}
+        removed_edges_file = input_dir+'/'+graph_name+'_removed_edges'+'{:02d}.txt'.format(rank)
+        removed_edges = read_int_txt_file(removed_edges_file)
+        redge_datadict[constants.GLOBAL_SRC_ID] = removed_edges[:,0]
+        redge_datadict[constants.GLOBAL_DST_ID] = removed_edges[:,1]
+        redge_datadict[constants.GLOBAL_TYPE_EID] = removed_edges[:,2]
+        redge_datadict[constants.ETYPE_ID] = removed_edges[:,3]
+        print('[Rank: ', rank, '] Done reading removed_edge_file: ', len(redge_datadict), redge_datadict[constants.GLOBAL_SRC_ID].shape)
 
-    #read (single) file xxx_removed_edges.txt file
-    redge_datadict = {}
-    removed_edges_file = input_dir+'/'+graph_name+'_removed_edges'+'{:02d}.txt'.format(rank)
-    removed_edges = np.loadtxt(removed_edges_file, delimiter=' ', dtype='int64')
-    redge_datadict[constants.GLOBAL_SRC_ID] = removed_edges[:,0]
-    redge_datadict[constants.GLOBAL_DST_ID] = removed_edges[:,1]
-    redge_datadict[constants.GLOBAL_TYPE_EID] = removed_edges[:,2]
-    redge_datadict[constants.ETYPE_ID] = removed_edges[:,3]
-    print('[Rank: ', rank, '] Done reading removed_edge_file: ', len(redge_datadict), redge_datadict[constants.GLOBAL_SRC_ID].shape)
+        #wait for the feature files, in the order in which they were submitted
+        for feat_key, feat_future in feat_futures:
+            node_features[feat_key] = torch.from_numpy(feat_future.result())
+
+    #done build node_features locally. 
+    for k, v in node_features.items():
+        print('[Rank: ', rank, '] node feature name: ', k, ', feature data shape: ', v.size())
 
     return nodes_datadict, node_features, edge_datadict, redge_datadict 
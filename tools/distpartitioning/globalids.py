@@ -38,7 +38,7 @@ def get_shuffle_global_nids(rank, world_size, global_nids_ranks, node_data):
         return None
 
     #determine the no. of global_node_ids to send and receive and perform alltoall
-    send_counts = list(torch.Tensor(sizes).type(dtype=torch.int64).chunk(world_size))
+    send_counts = list(torch.tensor(sizes, dtype=torch.int64).chunk(world_size))
     recv_counts = list(torch.zeros([world_size], dtype=torch.int64).chunk(world_size))
     alltoall_cpu(rank, world_size, recv_counts, send_counts)
 
@@ -47,10 +47,11 @@ def get_shuffle_global_nids(rank, world_size, global_nids_ranks, node_data):
     for i in recv_counts:
         recv_nodes.append(torch.zeros([i.item()], dtype=torch.int64))
 
-    #form the outgoing message
+    #form the outgoing message, torch.from_numpy shares the memory of the int64 arrays
+    #instead of copying them through a float32 tensor
     send_nodes = []
     for i in range(world_size):
-        send_nodes.append(torch.Tensor(global_nids_ranks[i]).type(dtype=torch.int64))
+        send_nodes.append(torch.from_numpy(global_nids_ranks[i].astype(np.int64, copy=False)))
 
     #send-recieve messages
     alltoallv_cpu(rank, world_size, recv_nodes, send_nodes)
@@ -68,7 +69,7 @@ def get_shuffle_global_nids(rank, world_size, global_nids_ranks, node_data):
         if (len(global_nids) != 0):
             common, ind1, ind2 = np.intersect1d(node_data[constants.GLOBAL_NID], global_nids, return_indices=True)
             values = node_data[constants.SHUFFLE_GLOBAL_NID][ind1]
-            send_nodes.append(torch.Tensor(values).type(dtype=torch.int64))
+            send_nodes.append(torch.from_numpy(values))
         else:
             send_nodes.append(torch.empty((0,), dtype=torch.int64))
 
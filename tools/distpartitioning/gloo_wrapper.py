@@ -6,7 +6,9 @@ def allgather_sizes(send_data, world_size):
     """ 
     Perform all gather on list lengths, used to compute prefix sums
     to determine the offsets on each ranks. This is used to allocate
-    global ids for edges/nodes on each ranks.
+    global ids for edges/nodes on each ranks. Several lengths can be 
+    sent at once, in which case a prefix sum is computed for each of them
+    with a single all gather.
 
     Parameters
     ----------
@@ -18,7 +20,8 @@ def allgather_sizes(send_data, world_size):
     Returns : 
     ---------
         numpy array
-            array with the prefix sum
+            array with the prefix sum, of shape (world_size + 1,) when send_data 
+            has one element and (world_size + 1, len(send_data)) otherwise
     """
 
     #compute the length of the local data
@@ -31,12 +34,11 @@ def allgather_sizes(send_data, world_size):
     dist.all_gather(in_tensor, out_tensor)
 
     #gather sizes in on array to return to the invoking function
-    rank_sizes = np.zeros(world_size + 1, dtype=np.int64)
-    count = rank_sizes[0]
-    for i, t in enumerate(in_tensor): 
-        count += t.item()
-        rank_sizes[i+1] = count
+    rank_sizes = np.zeros((world_size + 1, send_length), dtype=np.int64)
+    rank_sizes[1:] = np.cumsum(torch.stack(in_tensor).numpy(), axis=0)
 
+    if send_length == 1:
+        return rank_sizes[:, 0]
     return rank_sizes
 
 def alltoall_cpu(rank, world_size, output_tensor_list, input_tensor_list):
@@ -59,6 +61,35 @@ def alltoall_cpu(rank, world_size, output_tensor_list, input_tensor_list):
     for i in range(world_size):
         dist.scatter(output_tensor_list[i], input_tensor_list if i == rank else [], src=i)
 
+def alltoall_sizes(rank, world_size, send_sizes):
+    """
+    Exchange the shapes of the messages which each process sends to every other process.
+    A single all_gather of the complete table of shapes is used, instead of one scatter 
+    per process as in alltoall_cpu.
+
+    Parameters
+    ----------
+    rank : int
+        The rank of current worker
+    world_size : int
+        The total no. of processes
+    send_sizes : numpy array
+        2-d array of shape (world_size, d), where row i is the shape of the message
+        which is sent to process i
+
+    Returns
+    -------
+    numpy array
+        2-d array of shape (world_size, d), where row i is the shape of the message
+        which is received from process i
+    """
+    out_tensor = torch.as_tensor(send_sizes, dtype=torch.int64)
+    in_tensor = [torch.zeros_like(out_tensor) for _ in range(world_size)]
+    dist.all_gather(in_tensor, out_tensor)
+
+    #row `rank` of the table gathered from process i is the message process i sends to this rank
+    return torch.stack(in_tensor)[:, rank].numpy()
+
 def alltoall_cpu_object_lst(rank, world_size, input_list):
     """
     Each process scatters list of input objects to all processes in a cluster
@@ -88,7 +119,7 @@ def alltoall_cpu_object_lst(rank, world_size, input_list):
 
     return output_list
 
-def alltoallv_cpu(rank, world_size, output_tensor_list, input_tensor_list):
+def alltoallv_cpu(rank, world_size, output_tensor_list, input_tensor_list, tag=0, async_op=False):
     """
     Each process scatters list of input tensors to all processes in a cluster
     and return gathered list of tensors in output list.
@@ -103,6 +134,17 @@ def alltoallv_cpu(rank, world_size, output_tensor_list, input_tensor_list):
         The received tensors
     input_tensor_list : List of tensor
         The tensors to exchange
+    tag : int
+        Tag of the messages, exchanges which are in flight at the same time 
+        should use different tags
+    async_op : bool
+        When True, the function returns without waiting for the messages
+
+    Returns
+    -------
+    list of Work handles or None
+        handles of the sends and the receives when async_op is True, the output 
+        tensors and input tensors can be used only after waiting on all of them
     """
     # send tensor to each target trainer using torch.distributed.isend
     # isend is async
@@ -111,14 +153,27 @@ def alltoallv_cpu(rank, world_size, output_tensor_list, input_tensor_list):
         if i == rank:
             output_tensor_list[i] = input_tensor_list[i].to(torch.device('cpu'))
         else:
-            sender = dist.isend(input_tensor_list[i].to(torch.device('cpu')), dst=i)
+            sender = dist.isend(input_tensor_list[i].to(torch.device('cpu')), dst=i, tag=tag)
             senders.append(sender)
 
+    # post all the receives at once, so that messages from different processes
+    # are received concurrently rather than one process at a time
+    receivers = []
     for i in range(world_size):
         if i != rank:
-            dist.recv(output_tensor_list[i], src=i)
+            receiver = dist.irecv(output_tensor_list[i], src=i, tag=tag)
+            receivers.append(receiver)
+
+    if async_op:
+        return receivers + senders
+
+    for receiver in receivers:
+        receiver.wait()
 
-    torch.distributed.barrier()
+    # waiting on the local sends is enough for the input tensors to be reusable,
+    # a global barrier would only add another round-trip
+    for sender in senders:
+        sender.wait()
 
 def gather_metadata_json(metadata, rank, world_size): 
     """ 
@@ -132,13 +187,16 @@ def gather_metadata_json(metadata, rank, world_size):
     --------
     list : list of json dictionary objects
         The result of the gather operation, which is the list of json dicitonary 
-        objects from each rank in the world
+        objects from each rank in the world, on rank-0 and None on the other ranks
     """
 
     #Populate input obj and output obj list on rank-0 and non-rank-0 machines
     input_obj = None if rank == 0 else metadata
     output_objs = [None for _ in range(world_size)] if rank == 0 else None
 
-    #invoke the gloo method to perform gather on rank-0
+    #invoke the gloo method to perform gather on rank-0, rank-0 does not send its own
+    #metadata through the collective and places it in the result directly
     dist.gather_object(input_obj, output_objs, dst=0)
+    if rank == 0:
+        output_objs[0] = metadata
     return output_objs
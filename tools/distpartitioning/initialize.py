@@ -1,5 +1,4 @@
 import os
-import json
 import numpy as np
 import torch
 import torch.distributed as dist
@@ -9,15 +8,18 @@ import random
 
 from timeit import default_timer as timer
 from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
 from utils import augment_node_data, augment_edge_data,\
                   read_nodes_file, read_edges_file,\
                   read_node_features_file, read_edge_features_file,\
-                  read_partitions_file, read_json,\
-                  get_node_types, write_metadata_json, write_dgl_objects
+                  get_node_part_ids, read_partitions_file, read_json,\
+                  get_node_types, write_metadata_json, write_dgl_objects,\
+                  reorder_data, prefetch_files
 from globalids import assign_shuffle_global_nids_nodes, assign_shuffle_global_nids_edges,\
                       get_shuffle_global_nids_edges
 from gloo_wrapper import gather_metadata_json
 from convert_partition import create_dgl_object, create_metadata_json
+from multi_dev_init import splitdata_exec
 
 def send_node_data(rank, node_data, part_ids):
     """ 
@@ -33,6 +35,9 @@ def send_node_data(rank, node_data, part_ids):
         list of unique ranks/partition-ids
     """
 
+    #messages are sent asynchronously, the messages to one process are in flight 
+    #while the data for the next process is extracted
+    pending = []
     for part_id in part_ids: 
         if part_id == rank: 
             continue
@@ -50,17 +55,25 @@ def send_node_data(rank, node_data, part_ids):
         send_size = filt_data.shape
         size_tensor = torch.tensor(filt_data.shape, dtype=torch.int64)
 
-        # Send size first, so that the part-id (rank)
-        # can create appropriately sized buffers
-        dist.send(size_tensor, dst=part_id)
+        send_tensor = torch.from_numpy(filt_data.astype(np.int64))
 
-        #send actual node_data to part-id rank
+        #wait for the messages to the previous process, so that at most two 
+        #processes' data is buffered at any time
         start = timer()
-        send_tensor = torch.from_numpy(filt_data.astype(np.int64))
-        dist.send(send_tensor, dst=part_id)
+        for work, _ in pending:
+            work.wait()
         end = timer()
-        print('Rank: ', rank, ' Sent data size: ', filt_data.shape, \
-                ', to Process: ', part_id, 'in: ', timedelta(seconds = end - start))
+
+        # Send size first, so that the part-id (rank)
+        # can create appropriately sized buffers, followed by the actual node_data.
+        # The tensors are kept alongside their handles until the sends complete
+        pending = [(dist.isend(size_tensor, dst=part_id), size_tensor), \
+                    (dist.isend(send_tensor, dst=part_id), send_tensor)]
+        print('Rank: ', rank, ' Sending data size: ', filt_data.shape, \
+                ', to Process: ', part_id, ', waited for the previous send: ', timedelta(seconds = end - start))
+
+    for work, _ in pending:
+        work.wait()
 
 def send_edge_data(rank, edge_data, part_ids): 
     """ 
@@ -75,6 +88,9 @@ def send_edge_data(rank, edge_data, part_ids):
     part_ids : python list
         list of unique ranks/partition-ids
     """
+    #messages are sent asynchronously, the messages to one process are in flight 
+    #while the data for the next process is extracted
+    pending = []
     for part_id in part_ids: 
         if part_id == rank: 
             continue
@@ -91,16 +107,25 @@ def send_edge_data(rank, edge_data, part_ids):
         send_size = filt_data.shape
         size_tensor = torch.tensor(filt_data.shape, dtype=torch.int64)
 
-        # Send size first, so that the rProc can create appropriately sized tensor
-        dist.send(size_tensor, dst=part_id)
+        send_tensor = torch.from_numpy(filt_data)
 
+        #wait for the messages to the previous process, so that at most two 
+        #processes' data is buffered at any time
         start = timer()
-        send_tensor = torch.from_numpy(filt_data)
-        dist.send(send_tensor, dst=part_id)
+        for work, _ in pending:
+            work.wait()
         end = timer()
 
-        print('Rank: ', rank, ' Time to send Edges to proc: ', part_id, \
-                ' is : ', timedelta(seconds = end - start))
+        # Send size first, so that the rProc can create appropriately sized tensor.
+        # The tensors are kept alongside their handles until the sends complete
+        pending = [(dist.isend(size_tensor, dst=part_id), size_tensor), \
+                    (dist.isend(send_tensor, dst=part_id), send_tensor)]
+
+        print('Rank: ', rank, ' Sending Edges to proc: ', part_id, \
+                ', waited for the previous send: ', timedelta(seconds = end - start))
+
+    for work, _ in pending:
+        work.wait()
 
 def send_node_features(rank, node_data, node_features, part_ids, ntype_map):
     """ 
@@ -128,12 +153,13 @@ def send_node_features(rank, node_data, node_features, part_ids, ntype_map):
 
         part_node_features = {}
         for ntype_name, ntype in ntype_map.items():
+            feat_key = ntype_name+'/feat'
             
-            if (ntype_name +'/feat' in node_features) and (node_features[ntype_name+'/feat'].shape[0] > 0): 
+            if (feat_key in node_features) and (node_features[feat_key].shape[0] > 0): 
                 #extract orig_type_node_id
                 idx = (node_data[constants.OWNER_PROCESS] == part_id) & (node_data[constants.NTYPE_ID] == ntype) 
                 filt_global_type_nids = node_data[constants.GLOBAL_TYPE_NID][idx] # extract global_ntype_id here
-                part_node_features[ntype_name+'/feat'] = node_features[ntype_name+'/feat'][filt_global_type_nids]
+                part_node_features[feat_key] = node_features[feat_key][filt_global_type_nids]
 
         #accumulate subset of node_features targetted for part-id rank
         node_features_out.append(part_node_features)
@@ -340,7 +366,7 @@ def proc_exec(rank, world_size, params):
     """
 
     #Read METIS partitions
-    node_part_ids = read_partitions_file(params.input_dir+'/'+params.partitions_file)
+    node_part_ids = get_node_part_ids(params)
     print('Rank: ', rank, ', Completed loading metis partitions: ', len(node_part_ids))
 
     #read graph schema, get ntype_map(dict for ntype to ntype-id lookups) and ntypes list
@@ -358,9 +384,7 @@ def proc_exec(rank, world_size, params):
         # once this is ordered, node_features are automatically ordered and 
         # can be assigned contiguous ids starting from 0 for each type. 
         #node_data = node_data[node_data[:, 0].argsort()]
-        sorted_idx = node_data[constants.NTYPE_ID].argsort()
-        for k, v in node_data.items(): 
-            node_data[k] = v[sorted_idx]
+        reorder_data(node_data, constants.NTYPE_ID)
 
         print('Rank: ', rank, ', node_data: ', len(node_data))
         print('Rank: ', rank, ', node_features: ', len(node_features))
@@ -411,18 +435,15 @@ def proc_exec(rank, world_size, params):
     # process the data which is owned by the current process. 
     # At this time, all the processes will have all the data which it owns (nodes, edges, 
     # node-features and edge-features).
-
-    #syncronize
-    dist.barrier()
+    # No explicit barrier is needed here, the allgather used to assign shuffle_global ids 
+    # to nodes already synchronizes all the processes.
 
     # assign shuffle_global ids to nodes
     assign_shuffle_global_nids_nodes(rank, world_size, node_data)
     print('Rank: ', rank, ' Done assign Global ids to nodes...')
 
     #sort edge_data by etype
-    sorted_idx = edge_data[constants.ETYPE_ID].argsort()
-    for k, v in edge_data.items(): 
-        edge_data[k] = v[sorted_idx]
+    reorder_data(edge_data, constants.ETYPE_ID)
 
     # assign shuffle_global ids to edges
     shuffle_global_eid_start = assign_shuffle_global_nids_edges(rank, world_size, edge_data)
@@ -436,11 +457,10 @@ def proc_exec(rank, world_size, params):
     print('Rank: ', rank, ' Creating DGL objects for all partitions')
     num_nodes = 0
     num_edges = shuffle_global_eid_start
-    with open('{}/{}'.format(params.input_dir, params.schema)) as json_file: 
-        schema = json.load(json_file)
+    #schema_map, read at the beginning, is reused instead of reading the schema file again
     graph_obj, ntypes_map_val, etypes_map_val, ntypes_map, etypes_map = create_dgl_object(\
             params.graph_name, params.num_parts, \
-            schema, rank, node_data, edge_data, num_nodes, num_edges)
+            schema_map, rank, node_data, edge_data, num_nodes, num_edges)
     write_dgl_objects(graph_obj, node_features, edge_features, params.output, rank)
 
     #get the meta-data 
@@ -451,13 +471,32 @@ def proc_exec(rank, world_size, params):
     if (rank == 0): 
         #get meta-data from all partitions and merge them on rank-0
         metadata_list = gather_metadata_json(json_metadata, rank, world_size)
-        metadata_list[0] = json_metadata
         write_metadata_json(metadata_list, params.output, params.graph_name)
     else: 
         #send meta-data to Rank-0 process
         gather_metadata_json(json_metadata, rank, world_size)
 
-def single_dev_init(rank, world_size, func_exec, params, backend="gloo"):
+def get_process_group_timeout(params):
+    """
+    Timeout of the collectives in the process group. A single collective, such as the 
+    exchange of the edges of a large graph, can take longer than the default timeout. 
+    The DGL_PG_TIMEOUT environment variable, in seconds, overrides the command line argument.
+    Timeouts shorter than MIN_PROCESS_GROUP_TIMEOUT are raised to it.
+
+    Parameters:
+    -----------
+    params : argparser object
+        argument parser object to access the command line arguments
+
+    Returns:
+    --------
+    timedelta
+        timeout to be used when creating the process group
+    """
+    timeout = int(os.environ.get("DGL_PG_TIMEOUT", params.process_group_timeout))
+    return timedelta(seconds=max(timeout, constants.MIN_PROCESS_GROUP_TIMEOUT))
+
+def single_dev_init(rank, world_size, func_exec, params, backend="gloo", init_method=None):
     """
     Init. function which is run by each process in the Gloo ProcessGroup
 
@@ -473,12 +512,29 @@ def single_dev_init(rank, world_size, func_exec, params, backend="gloo"):
         argument parser object to access the command line arguments
     backend : string
         string specifying the type of backend to use for communication
+    init_method : string
+        url of the rendezvous, such as a `file://` url of a FileStore shared by all the processes
+        on this machine. When None, a TCPStore on 127.0.0.1:29500 is used
     """
-    os.environ["MASTER_ADDR"] = '127.0.0.1'
-    os.environ["MASTER_PORT"] = '29500'
+    #a process group created by an earlier invocation in this process is reused,
+    #the rendezvous is only paid once.
+    #a single process has no peers to rendezvous with, so an in-memory store is
+    #used instead of a TCPStore and no socket is opened for it
+    if dist.is_initialized():
+        pass
+    elif world_size == 1:
+        dist.init_process_group(backend, store=dist.HashStore(), rank=rank, world_size=world_size, \
+                                timeout=get_process_group_timeout(params))
+    elif init_method is not None:
+        dist.init_process_group(backend, init_method=init_method, rank=rank, world_size=world_size, \
+                                timeout=get_process_group_timeout(params))
+    else:
+        os.environ["MASTER_ADDR"] = '127.0.0.1'
+        os.environ["MASTER_PORT"] = '29500'
 
-    #create Gloo Process Group
-    dist.init_process_group(backend, rank=rank, world_size=world_size)
+        #create Gloo Process Group
+        dist.init_process_group(backend, rank=rank, world_size=world_size, \
+                                timeout=get_process_group_timeout(params))
 
     #Invoke the main function to kick-off each process
     func_exec(rank, world_size, params)
@@ -492,8 +548,44 @@ def multi_dev_init(params):
     params : argparser object
         argparser object providing access to command line arguments.
     """
-    #init the gloo process group here. 
-    dist.init_process_group("gloo", rank=params.rank, world_size=params.world_size)
+    #the launcher (torchrun or torch.distributed.launch) sets the rank, world size and 
+    #rendezvous address of each process in the environment, which the default env:// 
+    #init_method of the process group reads
+    params.rank = int(os.environ.get("RANK", 0))
+    params.world_size = int(os.environ.get("WORLD_SIZE", params.world_size))
+
+    #start reading the input files of this rank into the page cache, the kernel 
+    #reads them while this process waits for the rendezvous below
+    if (params.mul_files_dataset):
+        prefetch_files([params.input_dir+'/'+params.graph_name+'_'+name+'{:02d}.txt'.format(params.rank) \
+                            for name in ['nodes', 'edges', 'removed_edges']])
+    elif params.rank == 0:
+        prefetch_files([params.input_dir+'/'+name for name in \
+                            [params.nodes_file, params.edges_file, params.removed_edges, params.node_feats_file] \
+                            if name is not None])
+
+    #init the gloo process group here, a single process does not need a rendezvous.
+    #The rendezvous can block for a while, so it runs on a background thread while 
+    #the metis partitions, which are needed before the first collective, are read.
+    #When this function is invoked again in the same process, e.g. for the next graph 
+    #of a batch, the existing process group is reused
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        if dist.is_initialized():
+            init_future = None
+        elif params.world_size == 1:
+            init_future = executor.submit(dist.init_process_group, "gloo", store=dist.HashStore(), \
+                                            rank=params.rank, world_size=params.world_size, \
+                                            timeout=get_process_group_timeout(params))
+        else:
+            init_future = executor.submit(dist.init_process_group, "gloo", \
+                                            rank=params.rank, world_size=params.world_size, \
+                                            timeout=get_process_group_timeout(params))
+        #the file is always read here, a node_part_ids tensor left in params by an earlier 
+        #invocation belongs to the previous graph
+        params.node_part_ids = torch.from_numpy(read_partitions_file( \
+                        params.input_dir+'/'+params.partitions_file))
+        if init_future is not None:
+            init_future.result()
     print('[Rank: ', params.rank, '] Done with process group initialization...')
 
     #invoke the main function here.
@@ -2,6 +2,7 @@ import os
 import sys
 import constants
 import numpy as np
+import pandas as pd
 import math
 import torch
 import torch.distributed as dist
@@ -10,16 +11,60 @@ import torch.multiprocessing as mp
 from timeit import default_timer as timer
 from datetime import timedelta
 from dataset_utils import get_dataset
-from utils import read_partitions_file, read_json, get_node_types, \
+from utils import get_node_part_ids, read_json, get_node_types, \
                     augment_node_data, augment_edge_data, get_ntypes_map, \
-                    write_dgl_objects, write_metadata_json
-from gloo_wrapper import alltoall_cpu_object_lst, alltoallv_cpu, \
-                    alltoall_cpu, allgather_sizes, gather_metadata_json
-from globalids import assign_shuffle_global_nids_nodes, 
+                    write_dgl_objects, write_metadata_json, reorder_data, argsort_small_ints
+from gloo_wrapper import alltoallv_cpu, \
+                    alltoall_sizes, allgather_sizes, gather_metadata_json
+from globalids import assign_shuffle_global_nids_nodes, \
                     assign_shuffle_global_nids_edges, get_shuffle_global_nids_edges
 from convert_partition import create_dgl_object, create_metadata_json
 
-def exchange_node_data(rank, world_size, node_data):
+#dtypes at which node features can be shuffled and stored, only dtypes which 
+#dgl.data.utils.save_tensors/load_tensors can serialize are listed here
+FEAT_SHUFFLE_DTYPES = {'fp16': torch.float16}
+
+#tags of the node_data and edge_data messages, which are in flight at the same time
+NODE_DATA_TAG = 1
+EDGE_DATA_TAG = 2
+
+def bucket_data_by_owner(data, col_names, world_size, dtype):
+    """
+    Group the rows of the node_data/edge_data columns by their owner process. The columns
+    are copied, in one pass each, into a single 2-d buffer where the rows owned by each
+    process form a contiguous block. Every column is popped from `data` as soon as it is
+    copied, and so is the OWNER_PROCESS column, so that only one copy of the rows stays alive.
+
+    Parameters:
+    -----------
+    data : dictionary
+        node_data or edge_data dictionary, with column names as keys and columns as values,
+        which includes the OWNER_PROCESS column
+    col_names : list of strings
+        names of the columns to copy into the buffer, in the order of the buffer columns
+    world_size : int
+        total no. of participating processes
+    dtype : numpy dtype
+        data type of the buffer
+
+    Returns:
+    --------
+    numpy ndarray
+        buffer of shape (no. of rows, len(col_names)), with rows sorted by owner process
+    numpy array
+        world_size + 1 offsets, rows bounds[i] to bounds[i+1] of the buffer are owned by process i
+    """
+    owner_ids = data.pop(constants.OWNER_PROCESS)
+    sorted_idx = argsort_small_ints(owner_ids)
+    bounds = np.zeros(world_size + 1, dtype=np.int64)
+    bounds[1:] = np.cumsum(np.bincount(owner_ids, minlength=world_size))
+
+    buf = np.empty((owner_ids.shape[0], len(col_names)), dtype=dtype)
+    for col_idx, col in enumerate(col_names):
+        buf[:, col_idx] = data.pop(col)[sorted_idx]
+    return buf, bounds
+
+def exchange_node_data(rank, world_size, node_data, async_op=False):
     """
     Exchange node_data among the processes in the world
     Prepare the list of slices targeting each of the process and
@@ -34,51 +79,62 @@ def exchange_node_data(rank, world_size, node_data):
     node_data : dictionary
         nodes data dictionary with keys as column names and values as
         columns from the nodes csv file
+    async_op : bool
+        when True, the function returns while the messages are still in flight
+
+    Returns:
+    --------
+    function or None
+        when async_op is True, a function which waits for the messages and replaces
+        the node_data values with the received node data
     """
     input_list = []
-    send_sizes = []
-    recv_sizes = []
+    send_sizes = np.zeros((world_size, 2), dtype=np.int64)
     start = timer()
+
+    #group the nodes by their owner process, the nodes targeting each process
+    #are a contiguous block of rows which is sent without any further copy
+    node_cols = [constants.NTYPE_ID, constants.GLOBAL_TYPE_NID, constants.GLOBAL_NID]
+    sorted_nodes, bounds = bucket_data_by_owner(node_data, node_cols, world_size, np.int64)
     for i in np.arange(world_size):
-        send_idx = (node_data[constants.OWNER_PROCESS] == i)
-        idx = send_idx.reshape(node_data[constants.GLOBAL_NID].shape[0])
-        filt_data = np.column_stack((node_data[constants.NTYPE_ID][idx == 1], \
-                                node_data[constants.GLOBAL_TYPE_NID][idx == 1], \
-                                node_data[constants.GLOBAL_NID][idx == 1]))
-        if(filt_data.shape[0] <= 0): 
-            input_list.append(torch.empty((0,), dtype=torch.int64))
-            send_sizes.append(torch.empty((0,), dtype=torch.int64))
-        else:
-            input_list.append(torch.from_numpy(filt_data))
-            send_sizes.append(torch.tensor(filt_data.shape, dtype=torch.int64))
-        recv_sizes.append(torch.zeros((2,), dtype=torch.int64))
+        filt_data = sorted_nodes[bounds[i]:bounds[i+1]]
+        input_list.append(torch.from_numpy(filt_data))
+        send_sizes[i] = filt_data.shape
     end = timer()
     print('[Rank: ', rank, '] Preparing node_data to send out: ', timedelta(seconds=end - start))
 
     #exchange sizes first followed by data. 
     start = timer()
-    alltoall_cpu(rank, world_size, recv_sizes, send_sizes)
+    recv_sizes = alltoall_sizes(rank, world_size, send_sizes)
 
     output_list = []
     for s in recv_sizes: 
         output_list.append(torch.zeros(s.tolist(), dtype=torch.int64))
     
-    alltoallv_cpu(rank, world_size, output_list, input_list)
-    end = timer()
-    print('[Rank: ', rank, '] Time to exchange node data : ', timedelta(seconds=end - start))
-
-    #stitch together the received data to form a consolidated data-structure
-    rcvd_node_data = torch.cat(output_list).numpy()
-    print('[Rank: ', rank, '] Received node data shape ', rcvd_node_data.shape)
-
-    #Replace the node_data values with the received node data and the OWNER_PROCESS key-value
-    #pair is removed after the data communication
-    node_data[constants.NTYPE_ID] = rcvd_node_data[:,0]
-    node_data[constants.GLOBAL_TYPE_NID] = rcvd_node_data[:,1]
-    node_data[constants.GLOBAL_NID] = rcvd_node_data[:,2]
-    node_data.pop(constants.OWNER_PROCESS)
-
-def exchange_edge_data(rank, world_size, edge_data):
+    works = alltoallv_cpu(rank, world_size, output_list, input_list, \
+                    tag=NODE_DATA_TAG, async_op=True)
+
+    def wait_node_data():
+        for work in works:
+            work.wait()
+        end = timer()
+        print('[Rank: ', rank, '] Time to exchange node data : ', timedelta(seconds=end - start))
+
+        #stitch together the received data to form a consolidated data-structure
+        rcvd_node_data = torch.cat(output_list).numpy()
+        print('[Rank: ', rank, '] Received node data shape ', rcvd_node_data.shape)
+
+        #Replace the node_data values with the received node data, the OWNER_PROCESS key-value
+        #pair has already been removed before the data communication
+        node_data[constants.NTYPE_ID] = rcvd_node_data[:,0]
+        node_data[constants.GLOBAL_TYPE_NID] = rcvd_node_data[:,1]
+        node_data[constants.GLOBAL_NID] = rcvd_node_data[:,2]
+
+    if async_op:
+        return wait_node_data
+    wait_node_data()
+
+def exchange_edge_data(rank, world_size, edge_data, async_op=False):
     """
     Exchange edge_data among processes in the world.
     Prepare list of sliced data targeting each process and trigger
@@ -93,50 +149,140 @@ def exchange_edge_data(rank, world_size, edge_data):
     edge_data : dictionary
         edge information, as a dicitonary which stores column names as keys and values
         as column data. This information is read from the edges.txt file.
+    async_op : bool
+        when True, the function returns while the messages are still in flight
+
+    Returns:
+    --------
+    function or None
+        when async_op is True, a function which waits for the messages and replaces
+        the edge_data values with the received edge data
     """
+    #with a single process all the edges are already owned by this process
+    if (world_size == 1):
+        edge_data.pop(constants.OWNER_PROCESS)
+        return (lambda: None) if async_op else None
+
     input_list = []
-    send_sizes = []
-    recv_sizes = []
+    send_sizes = np.zeros((world_size, 2), dtype=np.int64)
     start = timer()
+
+    #all the columns are non-negative ids, when the largest id on all the processes fits
+    #in 32 bits the edges are sent as int32 which halves the size of the messages. 
+    #The largest local edge count is reduced along with it, to detect when there are no
+    #edges to exchange on any of the processes
+    edge_cols = [constants.GLOBAL_SRC_ID, constants.GLOBAL_DST_ID, constants.GLOBAL_TYPE_EID, \
+                    constants.ETYPE_ID, constants.GLOBAL_EID]
+    num_edges = edge_data[constants.ETYPE_ID].shape[0]
+    max_vals = torch.tensor([max([int(edge_data[col].max()) for col in edge_cols]) \
+                    if num_edges > 0 else 0, num_edges], dtype=torch.int64)
+    dist.all_reduce(max_vals, op=dist.ReduceOp.MAX)
+    if (max_vals[1].item() == 0):
+        edge_data.pop(constants.OWNER_PROCESS)
+        return (lambda: None) if async_op else None
+    payload_dtype = np.int32 if max_vals[0].item() <= np.iinfo(np.int32).max else np.int64
+
+    #group the edges by their owner process, the edges targeting each process
+    #are a contiguous block of rows which is sent without any further copy
+    sorted_edges, bounds = bucket_data_by_owner(edge_data, edge_cols, world_size, payload_dtype)
+
     for i in np.arange(world_size):
-        send_idx = (edge_data[constants.OWNER_PROCESS] == i)
-        send_idx = send_idx.reshape(edge_data[constants.GLOBAL_SRC_ID].shape[0])
-        filt_data = np.column_stack((edge_data[constants.GLOBAL_SRC_ID][send_idx == 1], \
-                                    edge_data[constants.GLOBAL_DST_ID][send_idx == 1], \
-                                    edge_data[constants.GLOBAL_TYPE_EID][send_idx == 1], \
-                                    edge_data[constants.ETYPE_ID][send_idx == 1], \
-                                    edge_data[constants.GLOBAL_EID][send_idx == 1]))
-        if(filt_data.shape[0] <= 0):
-            input_list.append(torch.empty((0,), dtype=torch.int64))
-            send_sizes.append(torch.empty((0,), dtype=torch.int64))
-        else:
-            input_list.append(torch.from_numpy(filt_data))
-            send_sizes.append(torch.tensor(filt_data.shape, dtype=torch.int64))
-        recv_sizes.append(torch.zeros((2,), dtype=torch.int64))
+        filt_data = sorted_edges[bounds[i]:bounds[i+1]]
+        input_list.append(torch.from_numpy(filt_data))
+        send_sizes[i] = filt_data.shape
     end = timer()
     print('[Rank: ', rank, '] Preparing edge_data to send out: ', timedelta(seconds=end-start))
     
     start = timer()
-    alltoall_cpu(rank, world_size, recv_sizes, send_sizes)
+    recv_sizes = alltoall_sizes(rank, world_size, send_sizes)
     output_list = []
     for s in recv_sizes: 
-        output_list.append(torch.zeros(s.tolist(), dtype=torch.int64))
+        output_list.append(torch.from_numpy(np.zeros(s, dtype=payload_dtype)))
+
+    works = alltoallv_cpu(rank, world_size, output_list, input_list, \
+                    tag=EDGE_DATA_TAG, async_op=True)
+
+    def wait_edge_data():
+        for work in works:
+            work.wait()
+        end = timer()
+        print('[Rank: ', rank, '] Time to send/rcv edge data: ', timedelta(seconds=end-start))
+
+        #the send buffer is not needed anymore, release it before stitching the received data
+        input_list.clear()
+
+        #Replace the values of the edge_data, with the received data from all the other processes.
+        #received tensors are contiguous cpu tensors, so concatenate their numpy views directly
+        #and widen the columns back to int64, int64 columns are kept as views
+        rcvd_edge_data = np.concatenate([t.numpy() for t in output_list])
+        for col_idx, col in enumerate(edge_cols):
+            edge_data[col] = rcvd_edge_data[:,col_idx].astype(np.int64, copy=False)
+
+    #filt_data and sorted_edges are referenced by input_list only
+    del filt_data, sorted_edges
+    if async_op:
+        return wait_edge_data
+    wait_edge_data()
+
+def get_buffer_layout(counts, row_bytes):
+    """
+    Compute the layout of a byte buffer which packs several pieces of data for each process. 
+    The part of the buffer for each process holds one piece per column of `counts`, followed by 
+    one piece whose no. of rows is the sum of that row of `counts`. Each piece is padded to a 
+    multiple of 8 bytes, so that every piece starts at an aligned offset and can be viewed in 
+    its own dtype without a copy.
 
-    alltoallv_cpu(rank, world_size, output_list, input_list)
-    end = timer()
-    print('[Rank: ', rank, '] Time to send/rcv edge data: ', timedelta(seconds=end-start))
+    Parameters:
+    -----------
+    counts : numpy array
+        2-d array of shape (world_size, no. of pieces - 1), no. of rows of each piece
+    row_bytes : numpy array
+        size in bytes of a row of each piece
+
+    Returns:
+    --------
+    numpy array
+        2-d array of shape (world_size, no. of pieces), no. of rows of each piece
+    numpy array
+        2-d array of shape (world_size, no. of pieces), byte offset of each piece in the buffer
+    numpy array
+        no. of bytes of the buffer for each process
+    """
+    piece_rows = np.column_stack((counts, counts.sum(axis=1)))
+    piece_bytes = (piece_rows * row_bytes + 7) // 8 * 8
+    offsets = np.zeros(piece_bytes.size + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(piece_bytes.ravel())
+    return piece_rows, offsets[:-1].reshape(piece_bytes.shape), piece_bytes.sum(axis=1)
+
+def get_buffer_piece(buf, offset, num_rows, dims, dtype):
+    """
+    View a piece of a byte buffer, as laid out by get_buffer_layout, as a tensor
 
-    #Replace the values of the edge_data, with the received data from all the other processes.
-    rcvd_edge_data = torch.cat(output_list).numpy()
-    edge_data[constants.GLOBAL_SRC_ID] = rcvd_edge_data[:,0]
-    edge_data[constants.GLOBAL_DST_ID] = rcvd_edge_data[:,1]
-    edge_data[constants.GLOBAL_TYPE_EID] = rcvd_edge_data[:,2]
-    edge_data[constants.ETYPE_ID] = rcvd_edge_data[:,3]
-    edge_data[constants.GLOBAL_EID] = rcvd_edge_data[:,4]
-    edge_data.pop(constants.OWNER_PROCESS)
+    Parameters:
+    -----------
+    buf : tensor
+        1-d uint8 tensor
+    offset : int
+        byte offset of the piece in the buffer
+    num_rows : int
+        no. of rows of the piece
+    dims : tuple
+        trailing shape of the rows
+    dtype : torch dtype
+        data type of the piece
+
+    Returns:
+    --------
+    tensor
+        tensor of shape (num_rows,) + dims which shares the memory of the buffer
+    """
+    if num_rows == 0:
+        return torch.empty((0,) + dims, dtype=dtype)
+    num_bytes = int(num_rows) * int(np.prod(dims)) * torch.empty((), dtype=dtype).element_size()
+    return buf[int(offset):int(offset) + num_bytes].view(dtype).view((int(num_rows),) + dims)
 
 def exchange_node_features(rank, world_size, node_data, node_features, ntypes_map, \
-        ntypes_nid_map, ntype_id_count, node_part_ids):
+        ntypes_nid_map, ntype_id_count, node_part_ids, feat_shuffle_dtype=None):
     """
     This function is used to shuffle node features so that each process will receive
     all the node features whose corresponding nodes are owned by the same process. 
@@ -163,7 +309,8 @@ def exchange_node_features(rank, world_size, node_data, node_features, ntypes_ma
         to the current process
     node_feautres: dicitonary
         dictionry where node_features are stored and this information is read from the appropriate
-        node features file which belongs to the current process
+        node features file which belongs to the current process. It is emptied as the features 
+        are sent out
     ntypes_map : dictionary
         mappings between node type names and node type ids
     ntypes_nid_map : dictionary
@@ -172,77 +319,148 @@ def exchange_node_features(rank, world_size, node_data, node_features, ntypes_ma
         mapping between node type id and no of nodes which belong to each node_type_id
     node_part_ids : numpy array
         numpy array which store the partition-ids and indexed by global_nids
+    feat_shuffle_dtype : torch dtype
+        when set, float32 features are cast to this dtype before they are sent and
+        are stored at this precision
     """
 
-    #determine Global_type_nid for the residing features 
-    node_features_rank_lst = []
-    global_nid_rank_lst = []
-    for part_id in np.arange(world_size):
-
-        #form outgoing features to each process
-        send_node_features = {}
-        send_global_nids = {}
-        for ntype_name, ntype_id in ntypes_map.items(): 
-
-            #check if features exist for this node_type
-            if (ntype_name+'/feat' in node_features) and (node_features[ntype_name+'/feat'].shape[0] > 0):
-                feature_count = node_features[ntype_name+'/feat'].shape[0]
-
-                #determine the starting global_nid for this node_type_id
-                feat_per_proc = math.ceil(ntype_id_count[str(ntype_id)] / world_size)
-                global_type_nid_start = feat_per_proc * rank
-                global_type_nid_end = global_type_nid_start
-                if ((global_type_nid_start + feat_per_proc) > feature_count):
-                    global_type_nid_end += (ntype_id_count[str(ntype_id)] - global_type_nid_start)
-                    type_nid = np.arange(0, (ntype_id_count[str(ntype_id)] - global_type_nid_start))
-                else: 
-                    global_type_nid_end += feat_per_proc 
-                    type_nid = np.arange(0, feat_per_proc)
-
-                #now map the global_ntype_id to global_nid 
-                global_nid_offset = ntypes_nid_map[ntype_name][0]
-                global_nid_start = global_type_nid_start + global_nid_offset
-                global_nid_end = global_type_nid_end + global_nid_offset
-
-                assert (global_nid_end - global_nid_start) == feature_count
-                global_nids = np.arange(global_nid_start, global_nid_end, dtype=np.int64)
-
-                #determine node feature ownership 
-                part_ids = node_part_ids[global_nids]
-                idx = (part_ids == part_id)
-                out_global_nid = global_nids[idx == 1]
-                out_type_nid = type_nid[idx == 1]
-                out_features = node_features[ntype_name+'/feat'][out_type_nid]
-                send_node_features[ntype_name+'/feat'] = out_features
-                send_global_nids[ntype_name+'/feat'] = out_global_nid
-
-        node_features_rank_lst.append(send_node_features)
-        global_nid_rank_lst.append(send_global_nids)
-
-    output_list = alltoall_cpu_object_lst(rank, world_size, node_features_rank_lst)
-    output_list[rank] = node_features_rank_lst[rank]
-
-    output_nid_list = alltoall_cpu_object_lst(rank, world_size, global_nid_rank_lst)
-    output_nid_list[rank] = global_nid_rank_lst[rank]
-            
-    #stitch node_features together to form one large feature tensor
+    #determine the global_nid range of the residing features for each node type,
+    #and group the rows of each feature tensor by their owner process. These 
+    #do not depend on the destination process, so they are computed once per 
+    #feature and looked up while forming the outgoing messages
+    feat_send_info = {}
+    for ntype_name, ntype_id in ntypes_map.items(): 
+        feat_key = ntype_name+'/feat'
+
+        #check if features exist for this node_type
+        if (feat_key in node_features) and (node_features[feat_key].shape[0] > 0):
+            feat_data = node_features[feat_key]
+            feature_count = feat_data.shape[0]
+
+            #cast before the rows are gathered, so that only the reduced precision copy is formed
+            if (feat_shuffle_dtype is not None) and (feat_data.dtype == torch.float32):
+                feat_data = feat_data.to(feat_shuffle_dtype)
+            type_nid_count = ntype_id_count[str(ntype_id)]
+
+            #determine the starting global_nid for this node_type_id
+            feat_per_proc = math.ceil(type_nid_count / world_size)
+            global_type_nid_start = feat_per_proc * rank
+            global_type_nid_end = global_type_nid_start
+            if ((global_type_nid_start + feat_per_proc) > feature_count):
+                global_type_nid_end += (type_nid_count - global_type_nid_start)
+            else: 
+                global_type_nid_end += feat_per_proc 
+
+            #now map the global_ntype_id to global_nid 
+            global_nid_offset = ntypes_nid_map[ntype_name][0]
+            global_nid_start = global_type_nid_start + global_nid_offset
+            global_nid_end = global_type_nid_end + global_nid_offset
+
+            assert (global_nid_end - global_nid_start) == feature_count
+
+            #global_nids is a contiguous range so the partition-ids can be read as a slice,
+            #and the positions of the rows are also their offsets within the feature tensor
+            part_ids = node_part_ids[global_nid_start:global_nid_end]
+            sorted_idx = argsort_small_ints(part_ids)
+            bounds = np.zeros(world_size + 1, dtype=np.int64)
+            bounds[1:] = np.cumsum(np.bincount(part_ids, minlength=world_size))
+            feat_send_info[feat_key] = (feat_data, global_nid_start, sorted_idx, bounds)
+
+    #the trailing shape and the dtype of each feature are needed to allocate the receive
+    #buffers, also on the processes which did not read any rows of that feature
+    local_feat_meta = {feat_key: (tuple(info[0].shape[1:]), info[0].dtype) \
+                        for feat_key, info in feat_send_info.items()}
+    feat_meta_list = [None] * world_size
+    dist.all_gather_object(feat_meta_list, local_feat_meta)
+    feat_meta = {}
+    for meta in feat_meta_list:
+        feat_meta.update(meta)
+
+    #features are exchanged in the order of ntypes_map, which is the same on all the processes
+    feat_keys = [ntype_name+'/feat' for ntype_name in ntypes_map if ntype_name+'/feat' in feat_meta]
+    if (len(feat_keys) == 0):
+        return {}, {}
+
+    #no. of rows sent to each process for each of the features, exchanged in one shot
+    send_counts = np.zeros((world_size, len(feat_keys)), dtype=np.int64)
+    for feat_idx, feat_key in enumerate(feat_keys):
+        if feat_key in feat_send_info:
+            send_counts[:, feat_idx] = np.diff(feat_send_info[feat_key][3])
+    recv_counts = alltoall_sizes(rank, world_size, send_counts)
+
+    #all the features, and the global_nids of their rows, are packed into one byte buffer which
+    #is exchanged with a single all_to_all_single. The part of the buffer for each process holds 
+    #one piece per feature followed by one piece with the global_nids of all the features.
+    #node_part_ids is indexed by global_nid on all the processes, so when it is shorter than
+    #the int32 range, the global_nids are sent as int32 which halves their size
+    nid_dtype = torch.int32 if len(node_part_ids) <= np.iinfo(np.int32).max else torch.int64
+    nid_piece = len(feat_keys)
+    piece_types = [feat_meta[feat_key] for feat_key in feat_keys] + [((), nid_dtype)]
+    row_bytes = np.array([int(np.prod(dims)) * torch.empty((), dtype=dtype).element_size() \
+                    for dims, dtype in piece_types], dtype=np.int64)
+    send_rows, send_offsets, send_bytes = get_buffer_layout(send_counts, row_bytes)
+    recv_rows, recv_offsets, recv_bytes = get_buffer_layout(recv_counts, row_bytes)
+
+    send_buf = torch.empty(int(send_bytes.sum()), dtype=torch.uint8)
+    for part_id in range(world_size):
+        nid_list = []
+        for feat_key in feat_keys:
+            if feat_key in feat_send_info:
+                _, global_nid_start, sorted_idx, bounds = feat_send_info[feat_key]
+                nid_list.append(sorted_idx[bounds[part_id]:bounds[part_id+1]] + global_nid_start)
+        if send_rows[part_id, nid_piece] > 0:
+            get_buffer_piece(send_buf, send_offsets[part_id, nid_piece], send_rows[part_id, nid_piece], \
+                    (), nid_dtype).copy_(torch.from_numpy(np.concatenate(nid_list)))
+
+    #rows owned by each process are gathered directly into their piece of the send buffer
+    for feat_idx, feat_key in enumerate(feat_keys):
+        if feat_key not in feat_send_info:
+            continue
+        feat_dims, feat_dtype = feat_meta[feat_key]
+        feat_data, _, sorted_idx, bounds = feat_send_info.pop(feat_key)
+        for part_id in range(world_size):
+            if send_rows[part_id, feat_idx] > 0:
+                torch.index_select(feat_data, 0, torch.from_numpy(sorted_idx[bounds[part_id]:bounds[part_id+1]]), \
+                        out=get_buffer_piece(send_buf, send_offsets[part_id, feat_idx], \
+                                send_rows[part_id, feat_idx], feat_dims, feat_dtype))
+
+        #the local rows of this feature are not needed anymore, release them before the
+        #next feature is gathered to keep the peak memory down
+        del feat_data
+        node_features.pop(feat_key, None)
+    node_features.clear()
+
+    recv_buf = torch.empty(int(recv_bytes.sum()), dtype=torch.uint8)
+    dist.all_to_all_single(recv_buf, send_buf, \
+            output_split_sizes=recv_bytes.tolist(), input_split_sizes=send_bytes.tolist())
+    del send_buf
+
+    #global_nids received from each process, and the offsets of each feature within them
+    recv_nids = [get_buffer_piece(recv_buf, recv_offsets[part_id, nid_piece], recv_rows[part_id, nid_piece], \
+                    (), nid_dtype).numpy().astype(np.int64) for part_id in range(world_size)]
+    nid_offsets = np.zeros_like(recv_counts)
+    nid_offsets[:, 1:] = np.cumsum(recv_counts[:, :-1], axis=1)
+
+    #stitch the pieces received from all the processes to form one feature tensor per feature
     rcvd_node_features = {}
     rcvd_global_nids = {}
-    for idx in range(world_size):
-        for ntype_name, ntype_id in ntypes_map.items():
-            if ((output_list[idx] is not None) and (ntype_name+'/feat' in output_list[idx])):
-                if (ntype_name+'/feat' not in rcvd_node_features):
-                    rcvd_node_features[ntype_name+'/feat'] = torch.empty((0,), dtype=torch.float)
-                    rcvd_global_nids[ntype_name+'/feat'] = torch.empty((0,), dtype=torch.int64)
-                rcvd_node_features[ntype_name+'/feat'] = \
-                    torch.cat((rcvd_node_features[ntype_name+'/feat'], output_list[idx][ntype_name+'/feat']))
-                rcvd_global_nids[ntype_name+'/feat'] = \
-                    np.concatenate((rcvd_global_nids[ntype_name+'/feat'], output_nid_list[idx][ntype_name+'/feat']))
+    for feat_idx, feat_key in enumerate(feat_keys):
+        feat_dims, feat_dtype = feat_meta[feat_key]
+        feat_list = []
+        nid_list = []
+        for part_id in range(world_size):
+            count = recv_rows[part_id, feat_idx]
+            if count > 0:
+                feat_list.append(get_buffer_piece(recv_buf, recv_offsets[part_id, feat_idx], count, feat_dims, feat_dtype))
+                nid_list.append(recv_nids[part_id][nid_offsets[part_id, feat_idx]:nid_offsets[part_id, feat_idx] + count])
+        if len(feat_list) > 0:
+            rcvd_node_features[feat_key] = torch.cat(feat_list)
+            rcvd_global_nids[feat_key] = np.concatenate(nid_list)
 
     return rcvd_node_features, rcvd_global_nids
 
 def exchange_graph_data(rank, world_size, node_data, node_features, edge_data,
-        node_part_ids, ntypes_map, ntypes_nid_map, ntype_id_count):
+        node_part_ids, ntypes_map, ntypes_nid_map, ntype_id_count, feat_shuffle_dtype=None):
     """
     Wrapper function which is used to shuffle graph data on all the processes. 
 
@@ -269,13 +487,19 @@ def exchange_graph_data(rank, world_size, node_data, node_features, edge_data,
         mapping between node type names and global_nids which belong to the keys in this dictionary
     ntype_id_count : dictionary
         mapping between node type id and no of nodes which belong to each node_type_id
+    feat_shuffle_dtype : torch dtype
+        when set, float32 node features are shuffled and stored at this precision
     """
     rcvd_node_features, rcvd_global_nids = exchange_node_features(rank, world_size, node_data, \
-            node_features, ntypes_map, ntypes_nid_map, ntype_id_count, node_part_ids)
+            node_features, ntypes_map, ntypes_nid_map, ntype_id_count, node_part_ids, feat_shuffle_dtype)
     print( 'Rank: ', rank, ' Done with node features exchange.')
 
-    exchange_node_data(rank, world_size, node_data)
-    exchange_edge_data(rank, world_size, edge_data)
+    #node_data and edge_data exchanges are independent of each other, so both are
+    #issued before waiting on either of them and the smaller one is hidden behind the larger
+    wait_node_data = exchange_node_data(rank, world_size, node_data, async_op=True)
+    wait_edge_data = exchange_edge_data(rank, world_size, edge_data, async_op=True)
+    wait_node_data()
+    wait_edge_data()
     return rcvd_node_features, rcvd_global_nids
 
 def read_dataset(rank, world_size, node_part_ids, params):
@@ -313,19 +537,20 @@ def read_dataset(rank, world_size, node_part_ids, params):
     node_data, node_features, edge_data, removed_edges = \
         get_dataset(params.input_dir, params.graph_name, rank)
 
-    prefix_sum_nodes = allgather_sizes([node_data[constants.NTYPE_ID].shape[0]], world_size)
-
-    augment_node_data(node_data, node_part_ids, prefix_sum_nodes[rank])
-    print('[Rank: ', rank, '] Done augmenting node_data: ', len(node_data), node_data[constants.GLOBAL_TYPE_NID].shape)
-
     edge_data[constants.GLOBAL_SRC_ID] = np.concatenate((edge_data[constants.GLOBAL_SRC_ID], removed_edges[constants.GLOBAL_SRC_ID]))
     edge_data[constants.GLOBAL_DST_ID] = np.concatenate((edge_data[constants.GLOBAL_DST_ID], removed_edges[constants.GLOBAL_DST_ID]))
     edge_data[constants.GLOBAL_TYPE_EID] = np.concatenate((edge_data[constants.GLOBAL_TYPE_EID], removed_edges[constants.GLOBAL_TYPE_EID]))
     edge_data[constants.ETYPE_ID] = np.concatenate((edge_data[constants.ETYPE_ID], removed_edges[constants.ETYPE_ID]))
 
-    prefix_sum_edges = allgather_sizes([edge_data[constants.ETYPE_ID].shape[0]], world_size)
+    #offsets for the global_nids and global_eids of the local nodes and edges, 
+    #both the prefix sums are computed with a single collective
+    prefix_sums = allgather_sizes([node_data[constants.NTYPE_ID].shape[0], \
+                                    edge_data[constants.ETYPE_ID].shape[0]], world_size)
+
+    augment_node_data(node_data, node_part_ids, prefix_sums[rank, 0])
+    print('[Rank: ', rank, '] Done augmenting node_data: ', len(node_data), node_data[constants.GLOBAL_TYPE_NID].shape)
 
-    augment_edge_data(edge_data, node_part_ids, prefix_sum_edges[rank])
+    augment_edge_data(edge_data, node_part_ids, prefix_sums[rank, 1])
     print('[Rank: ', rank, '] Done augmenting edge_data: ', len(edge_data), edge_data[constants.GLOBAL_SRC_ID].shape)
 
     return node_data, node_features, edge_data, edge_features
@@ -406,7 +631,7 @@ def splitdata_exec(rank, world_size, params):
     print('[Rank: ', rank, '] Starting distributed data processing pipeline...')
 
     #init processing
-    node_part_ids = read_partitions_file(params.input_dir+'/'+params.partitions_file)
+    node_part_ids = get_node_part_ids(params)
     schema_map = read_json(params.input_dir+'/'+params.schema)
     ntypes_map, ntypes = get_node_types(schema_map)
     print('[Rank: ', rank, '] Initialized metis partitions and node_types map...')
@@ -421,13 +646,13 @@ def splitdata_exec(rank, world_size, params):
     #and return the aggregated data
     ntypes_nid_map, ntype_id_count = get_ntypes_map(schema_map)
     rcvd_node_features, rcvd_global_nids  = exchange_graph_data(rank, world_size, node_data, \
-            node_features, edge_data, node_part_ids, ntypes_map, ntypes_nid_map, ntype_id_count)
+            node_features, edge_data, node_part_ids, ntypes_map, ntypes_nid_map, ntype_id_count, \
+            FEAT_SHUFFLE_DTYPES.get(params.feat_shuffle_dtype))
+    del node_features
     print('[Rank: ', rank, '] Done with data shuffling...')
 
     #sort node_data by ntype
-    idx = node_data[constants.NTYPE_ID].argsort()
-    for k, v in node_data.items():
-        node_data[k] = v[idx]
+    reorder_data(node_data, constants.NTYPE_ID)
     print('[Rank: ', rank, '] Sorted node_data by node_type')
 
     #resolve global_ids for nodes
@@ -435,19 +660,31 @@ def splitdata_exec(rank, world_size, params):
     print('[Rank: ', rank, '] Done assigning global-ids to nodes...')
 
     #shuffle node feature according to the node order on each rank. 
-    for ntype_name in ntypes: 
-        if (ntype_name+'/feat' in rcvd_global_nids):
-            global_nids = rcvd_global_nids[ntype_name+'/feat']
-
-            common, idx1, idx2 = np.intersect1d(node_data[constants.GLOBAL_NID], global_nids, return_indices=True)
-            shuffle_global_ids = node_data[constants.SHUFFLE_GLOBAL_NID][idx1]
-            feature_idx = shuffle_global_ids.argsort()
-            rcvd_node_features[ntype_name+'/feat'] = rcvd_node_features[ntype_name+'/feat'][feature_idx]
+    #a hash index is built once over the global_nids of the local nodes, and the
+    #global_nids of the received features of each node type are probed in it
+    gnid_index = pd.Index(node_data[constants.GLOBAL_NID])
+    #rcvd_global_nids holds only the received features, so it is iterated directly
+    #instead of forming the feature key of every node type
+    for feat_key, global_nids in rcvd_global_nids.items(): 
+        idx1 = gnid_index.get_indexer(global_nids)
+        assert np.all(idx1 >= 0)
+        shuffle_global_ids = node_data[constants.SHUFFLE_GLOBAL_NID][idx1]
+
+        #the gather copies the whole feature tensor, so it is done only when the
+        #received features are not already ordered by their shuffle_global_nids
+        if np.any(shuffle_global_ids[1:] < shuffle_global_ids[:-1]):
+            #shuffle_global_nids of a node type are a contiguous range, so the
+            #permutation is produced with a scatter instead of an argsort
+            start = shuffle_global_ids.min()
+            if (shuffle_global_ids.max() - start + 1) == len(shuffle_global_ids):
+                feature_idx = np.empty(len(shuffle_global_ids), dtype=np.int64)
+                feature_idx[shuffle_global_ids - start] = np.arange(len(shuffle_global_ids))
+            else:
+                feature_idx = shuffle_global_ids.argsort()
+            rcvd_node_features[feat_key] = rcvd_node_features[feat_key][feature_idx]
 
     #sort edge_data by etype
-    sorted_idx = edge_data[constants.ETYPE_ID].argsort()
-    for k, v in edge_data.items():
-        edge_data[k] = v[sorted_idx]
+    reorder_data(edge_data, constants.ETYPE_ID)
 
     shuffle_global_eid_start = assign_shuffle_global_nids_edges(rank, world_size, edge_data)
     print('[Rank: ', rank, '] Done assigning global_ids to edges ...')
@@ -472,7 +709,6 @@ def splitdata_exec(rank, world_size, params):
     if (rank == 0):
         #get meta-data from all partitions and merge them on rank-0
         metadata_list = gather_metadata_json(json_metadata, rank, world_size)
-        metadata_list[0] = json_metadata
         write_metadata_json(metadata_list, params.output, params.graph_name)
     else:
         #send meta-data to Rank-0 process
@@ -2,9 +2,12 @@ import os
 import torch
 import numpy as np
 import json
+import warnings
 import dgl
 import constants
 
+from concurrent.futures import ThreadPoolExecutor
+
 def read_partitions_file(part_file):
     """
     Utility method to read metis partitions, which is the output of 
@@ -24,11 +27,92 @@ def read_partitions_file(part_file):
     numpy array
         array of part_ids and the idx is the <global_nid>
     """
-    partitions_map = np.loadtxt(part_file, delimiter=' ', dtype=np.int64)
+    partitions_map = read_int_txt_file(part_file)
     #as a precaution sort the lines based on the <global_nid>
     partitions_map = partitions_map[partitions_map[:,0].argsort()]
     return partitions_map[:,1]
 
+def read_int_txt_file(file_name):
+    """
+    Utility function to read a text file of space separated integers, such as the
+    xxx_nodes.txt and xxx_edges.txt files, into a 2-D array. 
+
+    Parameters:
+    -----------
+    file_name : string
+        name of the file, every line of which has the same number of columns
+
+    Returns:
+    --------
+    numpy ndarray
+        int64 array with one row per line in the file
+    """
+    #the number of columns is taken from the first line and the whole file is then
+    #parsed in C by np.fromfile, instead of the line-by-line tokenizer of np.loadtxt
+    with open(file_name, 'r') as f:
+        num_cols = len(f.readline().split())
+
+    #np.fromfile stops at the first token which is not an integer and only warns, 
+    #returning the values read so far. Fail instead, as np.loadtxt does, rather than
+    #silently truncating the data
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', DeprecationWarning)
+        try:
+            data = np.fromfile(file_name, dtype=np.int64, sep=' ')
+        except DeprecationWarning as e:
+            raise ValueError('Could not parse ' + file_name + ': ' + str(e))
+
+    if (num_cols == 0) or (data.size % num_cols != 0):
+        raise ValueError('Could not parse ' + file_name + ': ' + str(data.size) + \
+                ' values do not form rows of ' + str(num_cols) + ' columns')
+    return data.reshape(-1, num_cols)
+
+def prefetch_files(file_names):
+    """
+    Utility function to ask the kernel to start reading the given files into the
+    page cache, so that they are already in memory when they are read later on.
+
+    Parameters:
+    -----------
+    file_names : list of strings
+        names of the files to prefetch, the ones which do not exist are skipped
+    """
+    #posix_fadvise only schedules the read-ahead and returns immediately, it is 
+    #not available on all platforms in which case nothing is prefetched
+    if not hasattr(os, 'posix_fadvise'):
+        return
+
+    for file_name in file_names:
+        if not os.path.isfile(file_name):
+            continue
+        fd = os.open(file_name, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+
+def get_node_part_ids(params):
+    """
+    Utility method to get the metis partitions. When the processes are spawned on a 
+    single machine the partitions file is read only once, by the parent process, and
+    shared with all the processes through shared memory. Otherwise it is read here.
+
+    Parameters:
+    -----------
+    params : argparser object
+        argument parser object to access the command line arguments, `node_part_ids`
+        is the shared tensor set by the parent process, if any
+
+    Returns:
+    --------
+    numpy array
+        array of part_ids and the idx is the <global_nid>
+    """
+    shared_part_ids = getattr(params, 'node_part_ids', None)
+    if shared_part_ids is not None:
+        return shared_part_ids.numpy()
+    return read_partitions_file(params.input_dir+'/'+params.partitions_file)
+
 def read_json(json_file):
     """
     Utility method to read a json file schema
@@ -146,6 +230,59 @@ def write_metadata_json(metadata_list, output_dir, graph_name):
     with open('{}/{}.json'.format(output_dir, graph_name), 'w') as outfile: 
         json.dump(graph_metadata, outfile, sort_keys=True, indent=4)
 
+def argsort_small_ints(arr):
+    """
+    Utility function to compute a stable argsort of integers which have a small range, 
+    such as node type ids, edge type ids and partition ids. A stable sort of 16-bit
+    keys is a radix sort in numpy, which is O(N) instead of O(N log N), so such
+    keys are sorted as uint16.
+
+    Parameters:
+    -----------
+    arr : numpy array
+        integer array to be sorted
+
+    Returns:
+    --------
+    numpy array
+        indices which sort `arr`, equal keys keep their relative order
+    """
+    if (len(arr) > 0) and (arr.min() >= 0) and (arr.max() <= np.iinfo(np.uint16).max):
+        return np.argsort(arr.astype(np.uint16), kind='stable')
+    return np.argsort(arr, kind='stable')
+
+def reorder_data(data, key):
+    """
+    Utility function to reorder all the columns of node_data/edge_data by the
+    values of one of its columns, for instance NTYPE_ID or ETYPE_ID.
+
+    The permutation is computed only once. Each column is then gathered with
+    np.take into a scratch buffer, and the column which is replaced becomes the
+    scratch buffer for the next column with the same dtype and shape. Only columns
+    which own their memory are reused this way, views into other arrays, such as
+    the shared node_part_ids, are never overwritten.
+
+    Parameters:
+    -----------
+    data : dictionary
+        dictionary where keys are column names and values are numpy arrays
+        of the same length
+    key : string
+        column name whose values are used as the sort key
+    """
+    sorted_idx = argsort_small_ints(data[key])
+
+    scratch = {}
+    for k, v in data.items():
+        buf_key = (v.dtype, v.shape[1:])
+        buf = scratch.pop(buf_key, None)
+        if buf is None:
+            buf = np.empty(v.shape, dtype=v.dtype)
+        np.take(v, sorted_idx, axis=0, out=buf)
+        data[k] = buf
+        if v.flags.writeable and v.flags.owndata:
+            scratch[buf_key] = v
+
 def augment_edge_data(edge_data, part_ids, id_offset):
     """
     Add partition-id (rank which owns an edge) column to the edge_data.
@@ -179,8 +316,10 @@ def augment_node_data(node_data, part_ids, offset):
     global_nids = np.arange(offset, offset + len(node_data[constants.GLOBAL_TYPE_NID]), dtype=np.int64)
     node_data[constants.GLOBAL_NID] = global_nids
 
-    #add owner proc_ids to the node_data
-    proc_ids = part_ids[node_data[constants.GLOBAL_NID]]
+    #add owner proc_ids to the node_data, global_nids form a contiguous range
+    #so their part_ids are read as a slice of part_ids. part_ids may be shared with
+    #other processes, so a copy is stored which can be reordered in place
+    proc_ids = part_ids[offset:offset + len(global_nids)].copy()
     node_data[constants.OWNER_PROCESS] = proc_ids
 
 def read_nodes_file(nodes_file):
@@ -207,7 +346,7 @@ def read_nodes_file(nodes_file):
     # nodes.txt file is of the following format
     # <node_type> <weight1> <weight2> <weight3> <weight4> <global_type_nid> <attributes>
     # For the ogb-mag dataset, nodes.txt is of the above format.
-    nodes_data = np.loadtxt(nodes_file, delimiter=' ', dtype='int64')
+    nodes_data = read_int_txt_file(nodes_file)
     nodes_datadict = {}
     nodes_datadict[constants.NTYPE_ID] = nodes_data[:,0]
     nodes_datadict[constants.GLOBAL_TYPE_NID] = nodes_data[:,5]
@@ -236,7 +375,7 @@ def read_edges_file(edge_file, edge_data_dict):
     # global_src_id -- global idx for the source node ... line # in the graph_nodes.txt
     # global_dst_id -- global idx for the destination id node ... line # in the graph_nodes.txt
 
-    edge_data = np.loadtxt(edge_file , delimiter=' ', dtype = 'int64')
+    edge_data = read_int_txt_file(edge_file)
 
     if (edge_data_dict == None): 
         edge_data_dict = {}
@@ -344,11 +483,19 @@ def write_dgl_objects(graph_obj, node_features, edge_features, output_dir, part_
 
     part_dir = output_dir + '/part' + str(part_id)
     os.makedirs(part_dir, exist_ok=True)
-    #write_graph_dgl(os.path.join(part_dir ,'part'+str(part_id)), graph_obj)
-    write_graph_dgl(os.path.join(part_dir ,'graph.dgl'), graph_obj)
 
-    if node_features != None:
-        write_node_features(node_features, os.path.join(part_dir, "node_feat.dgl"))
+    #the graph and the features are written to separate files, with no dependency
+    #among them, so the writes are issued concurrently
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        #write_graph_dgl(os.path.join(part_dir ,'part'+str(part_id)), graph_obj)
+        futures = [executor.submit(write_graph_dgl, os.path.join(part_dir ,'graph.dgl'), graph_obj)]
+
+        if node_features != None:
+            futures.append(executor.submit(write_node_features, node_features, os.path.join(part_dir, "node_feat.dgl")))
+
+        if (edge_features != None):
+            futures.append(executor.submit(write_edge_features, edge_features, os.path.join(part_dir, "edge_feat.dgl")))
 
-    if (edge_features != None):
-        write_edge_features(edge_features, os.path.join(part_dir, "edge_feat.dgl"))
+        #surface any exception raised while writing
+        for future in futures:
+            future.result()